@@ -1,19 +1,30 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional
+import logging
+
+# Configure logging before the utils are imported: they log while building their data at import time
+logging.basicConfig(level=logging.INFO)
+
 from app.utils.country_manager import country_manager
 from app.utils.address_fetcher import address_fetcher
 from app.utils.persona_generator import persona_generator
-import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Share one HTTP client (and its connection pool) across all requests
+    await address_fetcher.startup()
+    yield
+    await address_fetcher.shutdown()
+
 app = FastAPI(
     title="Real Address Generator API",
     description="Generates real addresses, names, and phone numbers based on country input.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 class AddressRequest(BaseModel):
@@ -33,28 +44,28 @@ class AddressResponse(BaseModel):
     google_maps_url: Optional[str] = None
 
 @app.get("/api/generate", response_model=AddressResponse)
-def generate_address(
+async def generate_address(
     country: str = Query(..., description="Country name (e.g., 'US', 'America', '美国')"),
     state: Optional[str] = Query(None, description="State/Province"),
     city: Optional[str] = Query(None, description="City"),
     zipcode: Optional[str] = Query(None, description="Zip/Postal Code")
 ):
-    return _process_generation(country, state, city, zipcode)
+    return await _process_generation(country, state, city, zipcode)
 
 @app.post("/api/generate", response_model=AddressResponse)
-def generate_address_post(request: AddressRequest):
-    return _process_generation(request.country, request.state, request.city, request.zipcode)
+async def generate_address_post(request: AddressRequest):
+    return await _process_generation(request.country, request.state, request.city, request.zipcode)
 
-def _process_generation(country_input, state, city, zipcode):
+async def _process_generation(country_input, state, city, zipcode):
     # 1. Normalize Country
     country_code = country_manager.normalize(country_input)
     if not country_code:
         # Fallback to US for adaptive behavior if normalization fails
-        logger.warning(f"Country normalization failed for input '{country_input}'. Defaulting to US.")
+        logger.warning("Country normalization failed for input '%s'. Defaulting to US.", country_input)
         country_code = "US"
 
     # 2. Fetch Real Address
-    real_address_data = address_fetcher.fetch_real_address(country_code, city, zipcode, state)
+    real_address_data = await address_fetcher.fetch_real_address(country_code, city, zipcode, state)
     
     if not real_address_data:
         # Fallback if external API is down completely (should be rare with our robust fallbacks)
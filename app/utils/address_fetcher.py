@@ -1,12 +1,69 @@
-import requests
+import asyncio
+import httpx
+import orjson
 import random
 import logging
 import time
 import os
+import redis.asyncio as aioredis
+from cachetools import TTLCache
 from app.utils.country_manager import country_manager
+from app.utils.circuit_breaker import CircuitBreaker
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+# Responses that mean "this endpoint is unhealthy right now", as opposed to a bad query
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# A failing endpoint is tried after the healthy ones for this long, then gets its configured place back
+ENDPOINT_COOLDOWN_SECONDS = 60
+# How long looked-up results stay cached, in-process and in Redis
+CACHE_TTL_SECONDS = 86400
+REDIS_KEY_PREFIX = b"real-address-gen:nominatim:"
+# Results requested per structured search
+NOMINATIM_RESULT_LIMIT = 3
+# Parameters shared by every search request
+BASE_SEARCH_PARAMS = {
+    "format": "jsonv2",
+    "addressdetails": 1,
+    "limit": NOMINATIM_RESULT_LIMIT,
+    "accept-language": "native"
+}
+# Level 2 city lookups allowed in flight at once for a single request
+LEVEL2_CONCURRENCY = 2
+
+SEARCH_KEYWORDS = (
+    "hotel", "restaurant", "school", "cafe", "bakery", "pharmacy",
+    "library", "post office", "park", "supermarket", "museum", "hospital"
+)
+MAJOR_CITIES = {
+    "US": ("New York", "Los Angeles", "Chicago", "Houston", "Phoenix"),
+    "CN": ("Beijing", "Shanghai", "Guangzhou", "Shenzhen"),
+    "GB": ("London", "Manchester", "Birmingham"),
+    "JP": ("Tokyo", "Osaka", "Kyoto"),
+    "DE": ("Berlin", "Munich", "Hamburg"),
+    "FR": ("Paris", "Lyon", "Marseille"),
+}
+
+# Result fields kept from each Nominatim hit
+RESULT_FIELDS = ("address", "name", "display_name", "lat", "lon")
+
+# OSM address fields to try, in order of preference
+STREET_KEYS = ("road", "pedestrian", "footway", "street")
+PLACE_NAME_KEYS = ("amenity", "shop")
+CITY_KEYS = ("city", "town", "village", "county", "municipality")
+STATE_KEYS = ("state", "province", "region")
+
+def _first(d, keys):
+    """
+    Returns the first truthy value of `keys` in `d`, or None.
+    """
+    for key in keys:
+        value = d.get(key)
+        if value:
+            return value
+    return None
+
 class AddressFetcher:
     def __init__(self):
         # Nominatim requires a valid User-Agent with contact info
@@ -14,20 +71,35 @@ class AddressFetcher:
         self.contact_email = os.getenv("NOMINATIM_EMAIL", "admin@realaddressgenerator.com")
         self.user_agent = os.getenv("NOMINATIM_USER_AGENT", f"RealAddressGenerator/1.0 ({self.contact_email})")
 
-        self.nominatim_url = "https://nominatim.openstreetmap.org/search"
-        self.search_keywords = [
-            "hotel", "restaurant", "school", "cafe", "bakery", "pharmacy", 
-            "library", "post office", "park", "supermarket", "museum", "hospital"
+        # Prioritized list of Nominatim search endpoints; later ones are used as failover mirrors
+        self.endpoints = [
+            url.strip() for url in os.getenv("NOMINATIM_URLS", DEFAULT_NOMINATIM_URL).split(",") if url.strip()
         ]
-        self.major_cities = {
-            "US": ["New York", "Los Angeles", "Chicago", "Houston", "Phoenix"],
-            "CN": ["Beijing", "Shanghai", "Guangzhou", "Shenzhen"],
-            "GB": ["London", "Manchester", "Birmingham"],
-            "JP": ["Tokyo", "Osaka", "Kyoto"],
-            "DE": ["Berlin", "Munich", "Hamburg"],
-            "FR": ["Paris", "Lyon", "Marseille"],
-        }
-        self.last_request_time = 0
+        self._endpoint_failures = {}
+        self._endpoint_failed_at = {}
+        # Kept just above Nominatim's typical latency so a sick upstream can't hold a request for long
+        self.connect_timeout = float(os.getenv("NOMINATIM_CONNECT_TIMEOUT", "3.05"))
+        self.read_timeout = float(os.getenv("NOMINATIM_READ_TIMEOUT", "10"))
+
+        self.last_request_time = float("-inf")
+        self._rate_limit_lock = None
+        self._rate_limit_loop = None
+        # Parsed Nominatim results keyed by normalized query (country, city, zip, state, broad)
+        self._cache = TTLCache(maxsize=10_000, ttl=CACHE_TTL_SECONDS)
+        # Lookups currently in flight, same keys as the cache: key -> {"task", "waiters"}
+        self._inflight = {}
+        # Trips after repeated failed lookups (every endpoint timed out / 429 / 5xx) so an outage fails fast instead of stacking timeouts
+        self._breaker = CircuitBreaker("nominatim", fail_max=5, reset_timeout=60)
+        # Shared async HTTP client, opened by the FastAPI lifespan (see startup/shutdown)
+        self.client = None
+        # Optional Redis second-level cache shared by all workers; enabled by REDIS_URL
+        self.redis_url = os.getenv("REDIS_URL")
+        self.redis = None
+        # Redis is only a cache, so skip it quickly while it's unreachable
+        self._redis_breaker = CircuitBreaker("redis", fail_max=3, reset_timeout=30)
+        # Clients opened by startup() and the event loop their connections are bound to
+        self._opened_clients = {}
+        self._client_loop = None
 
         # Check for configured User-Agent to warn user if still default
         if "contact@example.com" in self.user_agent:
@@ -40,136 +112,359 @@ class AddressFetcher:
             "User-Agent": self.user_agent
         }
 
-    def _wait_for_rate_limit(self):
+    async def startup(self):
+        """
+        Opens the shared HTTP client so keep-alive connections are reused across requests,
+        and the Redis cache client if REDIS_URL is set.
+        """
+        if self.redis is None and self.redis_url:
+            # Short timeouts: a slow cache must not cost more than the lookup it saves
+            self.redis = aioredis.from_url(self.redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+            self._opened_clients["redis"] = self.redis
+            self._client_loop = asyncio.get_running_loop()
+
+        if self.client is None:
+            # No transport retries: they would repeat connect timeouts against a dead host,
+            # multiplying the connect budget. Failures move on to the next endpoint instead.
+            transport = httpx.AsyncHTTPTransport(
+                http2=True,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+            self.client = httpx.AsyncClient(
+                transport=transport,
+                # Separate connect timeout so DNS/TCP trouble doesn't eat the whole read budget
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                headers=self._get_headers(),
+            )
+            self._opened_clients["client"] = self.client
+            self._client_loop = asyncio.get_running_loop()
+
+    async def shutdown(self):
+        """
+        Closes the shared HTTP and Redis clients.
+        """
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+        self._opened_clients = {}
+        self._client_loop = None
+
+    async def _ensure_clients(self):
+        """
+        Opens the clients when used outside the app lifespan (e.g. scripts, tests).
+        Their connections belong to the event loop that opened them, so clients left over
+        from an earlier asyncio.run() are replaced instead of reused.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client_loop is not None and self._client_loop is not loop:
+            # The old loop is usually closed already, so the stale clients can't be closed cleanly
+            for name, opened in self._opened_clients.items():
+                if getattr(self, name) is opened:
+                    setattr(self, name, None)
+            self._opened_clients = {}
+            self._client_loop = None
+        if self.client is None:
+            await self.startup()
+
+    def _get_rate_limit_lock(self):
+        """
+        Returns the rate-limit lock for the running event loop.
+        asyncio primitives are bound to one loop, while scripts and tests may run several.
+        """
+        loop = asyncio.get_running_loop()
+        if self._rate_limit_loop is not loop:
+            self._rate_limit_lock = asyncio.Lock()
+            self._rate_limit_loop = loop
+        return self._rate_limit_lock
+
+    async def _wait_for_rate_limit(self):
         """
         Ensures we respect Nominatim's absolute maximum of 1 request per second.
+        Waiting callers queue on a lock and sleep without blocking the event loop.
         """
-        current_time = time.time()
-        elapsed = current_time - self.last_request_time
-        if elapsed < 1.1: # 1.1 seconds to be safe
-            sleep_time = 1.1 - elapsed
-            logger.debug(f"Rate limiting: sleeping for {sleep_time:.2f}s")
-            time.sleep(sleep_time)
-        self.last_request_time = time.time()
+        async with self._get_rate_limit_lock():
+            elapsed = time.monotonic() - self.last_request_time
+            if elapsed < 1.1: # 1.1 seconds to be safe
+                sleep_time = 1.1 - elapsed
+                logger.debug("Rate limiting: sleeping for %.2fs", sleep_time)
+                await asyncio.sleep(sleep_time)
+            self.last_request_time = time.monotonic()
 
-    def fetch_real_address(self, country_code: str, city: str = None, zipcode: str = None, state: str = None):
+    async def fetch_real_address(self, country_code: str, city: str = None, zipcode: str = None, state: str = None):
         """
         Fetches a real address from OpenStreetMap (Nominatim).
         Uses intelligent fallbacks if specific inputs fail.
         """
-        fake = country_manager.get_faker(country_code)
-        
         # Level 1: Specific User Input (City OR Zipcode)
         # If Zipcode is provided, it's very specific, so we try to use it.
         if city or zipcode:
-            logger.info(f"Attempting Level 1 search with user input: City={city}, Zip={zipcode}, State={state}, Country={country_code}")
-            address = self._query_nominatim(country_code, city=city, zipcode=zipcode, state=state)
+            logger.info("Attempting Level 1 search with user input: City=%s, Zip=%s, State=%s, Country=%s", city, zipcode, state, country_code)
+            address = await self._query_nominatim(country_code, city=city, zipcode=zipcode, state=state)
             if address: return address
 
         # Level 2: Ignore User City/State/Zip (if they failed), generate a Random City for that country
-        logger.info(f"Attempting Level 2 search with random city for {country_code}")
+        logger.info("Attempting Level 2 search with random city for %s", country_code)
+        # Only needed for random cities, so Level 1 hits never touch Faker
+        fake = country_manager.get_faker(country_code)
+        candidates = []
         for _ in range(5):
             try:
-                random_city = fake.city()
-                address = self._query_nominatim(country_code, city=random_city)
-                # Prioritize address with zipcode
-                if address and address.get('zipcode'): return address
+                candidates.append(fake.city())
             except Exception as e:
-                logger.warning(f"Error in Level 2 random city generation: {e}")
-        
-        # Try Hardcoded Major Cities
-        if country_code in self.major_cities:
-            fallback_city = random.choice(self.major_cities[country_code])
-            logger.info(f"Attempting Level 2 fallback with major city: {fallback_city}")
-            address = self._query_nominatim(country_code, city=fallback_city)
-            if address: return address
+                logger.warning("Error in Level 2 random city generation: %s", e)
+        # Hardcoded major cities go last so random cities get the first slots
+        candidates.extend(MAJOR_CITIES.get(country_code, ()))
+
+        address = await self._query_cities_concurrently(country_code, candidates)
+        if address: return address
 
         # Level 3: Absolute fallback
-        logger.info(f"Attempting Level 3 broad search for {country_code}")
-        address = self._query_nominatim(country_code, city=None, broad_search=True)
+        logger.info("Attempting Level 3 broad search for %s", country_code)
+        address = await self._query_nominatim(country_code, city=None, broad_search=True)
         if address: return address
 
         return None
 
-    def _query_nominatim(self, country_code, city=None, zipcode=None, state=None, broad_search=False):
+    async def _query_cities_concurrently(self, country_code, cities):
+        """
+        Queries several cities at once and returns the first address with a zipcode,
+        cancelling the remaining lookups. Falls back to the first address without one.
+        """
+        # Keep only a couple of lookups in flight per request to stay polite to Nominatim
+        semaphore = asyncio.Semaphore(LEVEL2_CONCURRENCY)
+
+        async def probe(city):
+            async with semaphore:
+                return await self._query_nominatim(country_code, city=city)
+
+        tasks = [asyncio.ensure_future(probe(city)) for city in cities]
+        fallback = None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    address = await next_done
+                except Exception as e:
+                    logger.warning("Error in Level 2 city search: %s", e)
+                    continue
+                # Prioritize address with zipcode
+                if address and address.get('zipcode'):
+                    return address
+                fallback = fallback or address
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        return fallback
+
+    async def _query_nominatim(self, country_code, city=None, zipcode=None, state=None, broad_search=False):
         """
         Helper to execute the search query.
+        Results are cached per normalized query, so repeated lookups skip the HTTP call
+        (and the rate-limit wait) while still picking a random address each time.
         """
-        self._wait_for_rate_limit()
+        # The amenity keyword keeps results on real POIs that have a street address. It is drawn
+        # per call and is part of the key, so repeated queries still rotate through POI types.
+        keyword = random.choice(SEARCH_KEYWORDS)
+        key = (
+            country_code,
+            (city or "").strip().lower(),
+            (zipcode or "").strip(),
+            (state or "").strip().lower(),
+            broad_search,
+            keyword,
+        )
+
+        valid_results = self._cache.get(key)
+        if valid_results is None:
+            valid_results = await self._fetch_results_coalesced(key, country_code, city, zipcode, state, broad_search, keyword)
+            if not valid_results:
+                return None
+            self._cache[key] = valid_results
+        else:
+            logger.debug("Cache hit for Nominatim query %s", key)
+
+        return self._pick_result(valid_results, zipcode)
+
+    async def _fetch_results_coalesced(self, key, country_code, city=None, zipcode=None, state=None, broad_search=False, keyword=None):
+        """
+        Runs at most one Nominatim lookup per query key at a time.
+        Concurrent callers with the same key await the lookup already in flight
+        instead of spending another upstream request (and rate-limit slot) on it.
+        """
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(self._lookup_results(key, country_code, city, zipcode, state, broad_search, keyword))
+            entry = self._inflight[key] = {"task": task, "waiters": 0}
+        else:
+            logger.debug("Joining in-flight Nominatim query %s", key)
+
+        entry["waiters"] += 1
+        try:
+            # Shielded so one caller being cancelled (e.g. a losing Level 2 probe) doesn't cancel it for the others
+            return await asyncio.shield(entry["task"])
+        finally:
+            entry["waiters"] -= 1
+            if entry["waiters"] == 0:
+                if self._inflight.get(key) is entry:
+                    del self._inflight[key]
+                # No-op if finished; otherwise nobody is waiting for the result any more
+                entry["task"].cancel()
+
+    async def _lookup_results(self, key, country_code, city=None, zipcode=None, state=None, broad_search=False, keyword=None):
+        """
+        Returns results from the shared Redis cache, or queries Nominatim and stores them there.
+        """
+        await self._ensure_clients()
+        redis_key = REDIS_KEY_PREFIX + orjson.dumps(key)
+
+        cached = await self._redis_call("get", redis_key)
+        if cached:
+            logger.debug("Redis cache hit for Nominatim query %s", key)
+            return orjson.loads(cached)
+
+        valid_results = await self._fetch_results(country_code, city, zipcode, state, broad_search, keyword)
+        if valid_results:
+            await self._redis_call("set", redis_key, orjson.dumps(valid_results), ex=CACHE_TTL_SECONDS)
+        return valid_results
+
+    async def _redis_call(self, method, *args, **kwargs):
+        """
+        Runs a Redis command, returning None if Redis is disabled or unavailable.
+        """
+        if self.redis is None or not self._redis_breaker.allow_request():
+            return None
+        try:
+            result = await getattr(self.redis, method)(*args, **kwargs)
+        except (aioredis.RedisError, OSError) as e:
+            self._redis_breaker.record_failure()
+            logger.warning("Redis cache unavailable, skipping it: %s", e)
+            return None
+        self._redis_breaker.record_success()
+        return result
+
+    async def _fetch_results(self, country_code, city=None, zipcode=None, state=None, broad_search=False, keyword=None):
+        """
+        Queries Nominatim and returns the results that carry address details.
+        """
+        if not self._breaker.allow_request():
+            # Fail fast while Nominatim is unhealthy; cached results are still served by the caller
+            logger.debug("Nominatim circuit is open, skipping request.")
+            return None
+
+        # Structured search (separate fields instead of a free-form "q") is cheaper for
+        # Nominatim to resolve and more precise, so a few results are enough.
+        params = {**BASE_SEARCH_PARAMS, "amenity": keyword or random.choice(SEARCH_KEYWORDS), "countrycodes": country_code}
 
-        keyword = random.choice(self.search_keywords)
-        
-        query_parts = []
-        
         if not broad_search:
-            query_parts.append(keyword)
             # If zipcode is provided, it's a strong filter.
             if zipcode:
-                # Nominatim handles zipcodes well in free-form query or structured.
-                # Let's try appending it to query parts.
-                query_parts.append(f"in {zipcode}")
-            
+                params["postalcode"] = zipcode
             if city:
-                # If we have both zip and city, using both is good.
-                # "Hotel in 10001 New York"
-                query_parts.append(f"in {city}")
-            
+                params["city"] = city
             if state:
-                query_parts.append(state)
-        else:
-            query_parts.append(f"{keyword} in") 
+                params["state"] = state
 
-        q_str = " ".join(query_parts)
-        
-        params = {
-            "q": q_str,
-            "countrycodes": country_code,
-            "format": "jsonv2",
-            "addressdetails": 1,
-            "limit": 10, 
-            "accept-language": "native" 
-        }
+        for url in self._ordered_endpoints():
+            await self._wait_for_rate_limit()
+            try:
+                resp = await self.client.get(url, params=params)
+            except httpx.HTTPError as e:
+                # Timeouts, connection errors, bad encodings, redirect loops: try the next mirror
+                self._record_endpoint_failure(url)
+                logger.error("Nominatim Request Error (%s): %s", url, e)
+                continue
 
-        try:
-            resp = requests.get(self.nominatim_url, params=params, headers=self._get_headers(), timeout=25)
-            if resp.status_code == 200:
-                results = resp.json()
-                if results:
-                    valid_results = [r for r in results if 'address' in r]
-                    if valid_results:
-                        # Prioritize results with postcode
-                        results_with_zip = [r for r in valid_results if r['address'].get('postcode')]
-
-                        if results_with_zip:
-                            picked = random.choice(results_with_zip)
-                        else:
-                            picked = random.choice(valid_results)
-
-                        address_data = self._parse_osm_result(picked)
-
-                        # Fallback for missing zipcode ONLY if user provided it
-                        if not address_data.get('zipcode') and zipcode:
-                            address_data['zipcode'] = zipcode
-                            logger.info(f"Zipcode missing from OSM, using provided input: {zipcode}")
-
-                        return address_data
-            elif resp.status_code == 403:
-                logger.error("Nominatim returned 403 Forbidden. Please check your User-Agent or Rate Limits. You may need to set NOMINATIM_EMAIL or NOMINATIM_USER_AGENT environment variables.")
-                logger.warning(f"Response text: {resp.text}")
-            else:
-                logger.warning(f"Nominatim returned status {resp.status_code}")
-        except Exception as e:
-            logger.error(f"Nominatim Request Error: {e}")
-        
+            if resp.status_code in RETRYABLE_STATUS_CODES:
+                self._record_endpoint_failure(url)
+                logger.warning("Nominatim (%s) returned status %s, trying next endpoint", url, resp.status_code)
+                continue
+
+            # The endpoint answered, so it is healthy even if the query itself found nothing
+            self._endpoint_failures.pop(url, None)
+            self._endpoint_failed_at.pop(url, None)
+            self._breaker.record_success()
+
+            try:
+                if resp.status_code == 200:
+                    results = orjson.loads(resp.content)
+                    if results:
+                        # Keep only what _parse_osm_result reads; the rest (boundingbox, licence, ...) would sit in the cache
+                        return [{k: r[k] for k in RESULT_FIELDS if k in r} for r in results if 'address' in r]
+                elif resp.status_code == 403:
+                    logger.error("Nominatim returned 403 Forbidden. Please check your User-Agent or Rate Limits. You may need to set NOMINATIM_EMAIL or NOMINATIM_USER_AGENT environment variables.")
+                    logger.warning("Response text: %s", resp.text)
+                else:
+                    logger.warning("Nominatim returned status %s", resp.status_code)
+            except Exception as e:
+                logger.error("Nominatim Response Error: %s", e)
+            return None
+
+        # Every endpoint failed
+        self._breaker.record_failure()
         return None
 
+    def _record_endpoint_failure(self, url):
+        """
+        Demotes `url` in the endpoint order for the next ENDPOINT_COOLDOWN_SECONDS.
+        """
+        self._endpoint_failures[url] = self._endpoint_failures.get(url, 0) + 1
+        self._endpoint_failed_at[url] = time.monotonic()
+
+    def _ordered_endpoints(self):
+        """
+        Returns the configured endpoints, healthiest first.
+        Failures older than ENDPOINT_COOLDOWN_SECONDS no longer count, so a recovered
+        primary is tried first again. The sort is stable, so configured priority breaks ties.
+        """
+        now = time.monotonic()
+
+        def recent_failures(url):
+            if now - self._endpoint_failed_at.get(url, float("-inf")) >= ENDPOINT_COOLDOWN_SECONDS:
+                return 0
+            return self._endpoint_failures.get(url, 0)
+
+        return sorted(self.endpoints, key=recent_failures)
+
+    def _pick_result(self, valid_results, zipcode=None):
+        """
+        Picks a random result (preferring ones with a postcode) and parses it.
+        """
+        # Single-pass reservoir sample: uniform among results with a postcode if any exist,
+        # otherwise uniform among all, without building filtered lists
+        picked = None
+        picked_has_zip = False
+        seen = 0
+        for r in valid_results:
+            has_zip = bool(r['address'].get('postcode'))
+            if has_zip and not picked_has_zip:
+                # First result with a postcode: restart the sample among those only
+                picked_has_zip = True
+                seen = 0
+            elif has_zip != picked_has_zip:
+                continue
+            seen += 1
+            if random.randrange(seen) == 0:
+                picked = r
+
+        address_data = self._parse_osm_result(picked)
+
+        # Fallback for missing zipcode ONLY if user provided it
+        if not address_data.get('zipcode') and zipcode:
+            address_data['zipcode'] = zipcode
+            logger.info("Zipcode missing from OSM, using provided input: %s", zipcode)
+
+        return address_data
+
     def _parse_osm_result(self, result):
         """
         Extracts relevant fields from OSM result.
         """
         addr = result.get('address', {})
         
-        street = addr.get('road') or addr.get('pedestrian') or addr.get('footway') or addr.get('street')
+        street = _first(addr, STREET_KEYS)
         house_num = addr.get('house_number')
         
         address_line = ""
@@ -179,10 +474,10 @@ class AddressFetcher:
             else:
                 address_line = street
         else:
-            address_line = addr.get('amenity') or addr.get('shop') or result.get('name') or "Unknown Street"
+            address_line = _first(addr, PLACE_NAME_KEYS) or result.get('name') or "Unknown Street"
 
-        city = addr.get('city') or addr.get('town') or addr.get('village') or addr.get('county') or addr.get('municipality')
-        state = addr.get('state') or addr.get('province') or addr.get('region')
+        city = _first(addr, CITY_KEYS)
+        state = _first(addr, STATE_KEYS)
         zipcode = addr.get('postcode')
         country = addr.get('country')
         full_address = result.get('display_name')
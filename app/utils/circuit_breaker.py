@@ -0,0 +1,70 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class CircuitBreaker:
+    """
+    Minimal closed/open/half-open circuit breaker.
+    After `fail_max` consecutive failures the circuit opens and calls are rejected
+    until `reset_timeout` seconds have passed, then a single trial call is let through.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, name: str, fail_max: int = 5, reset_timeout: float = 60):
+        self.name = name
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self.failure_count = 0
+        self.opened_at = None
+        # Start of the half-open trial call, so concurrent callers keep failing fast meanwhile
+        self.trial_started_at = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == self.OPEN
+
+    def allow_request(self) -> bool:
+        """
+        Returns False while the circuit is open (calls should fail fast).
+        When half-open, only one trial call is allowed until its outcome is recorded.
+        """
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.OPEN:
+            return False
+        now = time.monotonic()
+        # A trial whose outcome never got recorded (e.g. a cancelled call) expires like the open state
+        if self.trial_started_at is not None and now - self.trial_started_at < self.reset_timeout:
+            return False
+        self.trial_started_at = now
+        return True
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("Circuit '%s' closed again after a successful call.", self.name)
+        self.reset()
+
+    def record_failure(self):
+        self.failure_count += 1
+        if self.state == self.HALF_OPEN or self.failure_count >= self.fail_max:
+            if self.state != self.OPEN:
+                logger.warning("Circuit '%s' opened after %s failures; failing fast for %ss.", self.name, self.failure_count, self.reset_timeout)
+            self.opened_at = time.monotonic()
+            self.trial_started_at = None
+
+    def reset(self):
+        self.failure_count = 0
+        self.opened_at = None
+        self.trial_started_at = None
@@ -1,47 +1,187 @@
+import babel
 from babel import Locale
 from babel.core import get_global
+import json
 import logging
+import os
 from faker import Faker
 from faker.config import AVAILABLE_LOCALES
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Preferred Faker locale per ISO country code: en_XX when Faker has one, otherwise the
+# first locale alphabetically. Generated by scripts/generate_faker_map.py; regenerate
+# after upgrading Faker or Babel.
+ISO_TO_FAKER = {
+    "AE": "ar_AE",
+    "AL": "sq_AL",
+    "AM": "hy_AM",
+    "AR": "es_AR",
+    "AT": "de_AT",
+    "AU": "en_AU",
+    "AZ": "az_AZ",
+    "BA": "bs_BA",
+    "BD": "bn_BD",
+    "BE": "fr_BE",
+    "BG": "bg_BG",
+    "BH": "ar_BH",
+    "BR": "pt_BR",
+    "CA": "en_CA",
+    "CH": "de_CH",
+    "CL": "es_CL",
+    "CN": "zh_CN",
+    "CO": "es_CO",
+    "CY": "el_CY",
+    "CZ": "cs_CZ",
+    "DE": "de_DE",
+    "DK": "da_DK",
+    "DZ": "ar_DZ",
+    "EE": "et_EE",
+    "EG": "ar_EG",
+    "ES": "es_ES",
+    "ET": "am_ET",
+    "FI": "fi_FI",
+    "FR": "fr_FR",
+    "GB": "en_GB",
+    "GE": "ka_GE",
+    "GH": "tw_GH",
+    "GR": "el_GR",
+    "HR": "hr_HR",
+    "HU": "hu_HU",
+    "ID": "id_ID",
+    "IE": "en_IE",
+    "IL": "he_IL",
+    "IN": "en_IN",
+    "IR": "fa_IR",
+    "IS": "is_IS",
+    "IT": "it_IT",
+    "JO": "ar_JO",
+    "JP": "ja_JP",
+    "KE": "en_KE",
+    "KR": "ko_KR",
+    "LI": "de_LI",
+    "LK": "si_LK",
+    "LT": "lt_LT",
+    "LU": "de_LU",
+    "LV": "lv_LV",
+    "MK": "mk_MK",
+    "MS": "en_MS",
+    "MT": "mt_MT",
+    "MX": "es_MX",
+    "NG": "en_NG",
+    "NL": "nl_NL",
+    "NP": "ne_NP",
+    "NZ": "en_NZ",
+    "PH": "en_PH",
+    "PK": "en_PK",
+    "PL": "pl_PL",
+    "PS": "ar_PS",
+    "PT": "pt_PT",
+    "RO": "ro_RO",
+    "RU": "ru_RU",
+    "SA": "ar_SA",
+    "SE": "sv_SE",
+    "SI": "sl_SI",
+    "SK": "sk_SK",
+    "TH": "th_TH",
+    "TR": "tr_TR",
+    "TW": "zh_TW",
+    "UA": "uk_UA",
+    "US": "en_US",
+    "UZ": "uz_UZ",
+    "VN": "vi_VN",
+    "ZA": "zu_ZA",
+}
+
+# Bump whenever the map-building logic below changes, so stale on-disk caches are rebuilt
+CACHE_FORMAT_VERSION = 3
+
+def _cache_file_path() -> str:
+    cache_home = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "real-address-gen", "country_maps.json")
+
+def _cache_fingerprint() -> dict:
+    # The map is derived from Babel data, so a Babel upgrade invalidates it too
+    return {
+        "format": CACHE_FORMAT_VERSION,
+        "babel": babel.__version__,
+    }
+
 class CountryManager:
     def __init__(self):
         self.country_map = {}
         self.iso_to_faker = {}
         self.faker_cache = {}
-        self.load_country_data()
+        if not self._load_cached_country_map():
+            self.load_country_data()
+            self._save_cached_country_map()
         self._build_faker_map()
 
+    def _load_cached_country_map(self) -> bool:
+        """
+        Loads the country map built by a previous process, if still valid.
+        """
+        try:
+            with open(_cache_file_path(), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        # Valid JSON can still have the wrong shape (hand edits, an older layout); rebuild then
+        if not isinstance(data, dict) or data.get("fingerprint") != _cache_fingerprint():
+            return False
+        country_map = data.get("country_map")
+        if not isinstance(country_map, dict):
+            return False
+        self.country_map = country_map
+
+        logger.info("Loaded %s country name mappings from cache.", len(self.country_map))
+        return True
+
+    def _save_cached_country_map(self):
+        """
+        Persists the built country map so later processes can skip rebuilding it.
+        Failures are not fatal (e.g. read-only filesystem).
+        """
+        path = _cache_file_path()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "fingerprint": _cache_fingerprint(),
+                    "country_map": self.country_map,
+                }, f, ensure_ascii=False)
+            # Atomic rename so concurrent workers never read a half-written file
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.debug("Could not write country map cache to %s: %s", path, e)
+
     def load_country_data(self):
         """
         Dynamically builds a dictionary mapping country names (English & Chinese) 
-        and codes to ISO 2-letter codes.
+        and codes to ISO 2-letter codes. Keys are casefolded.
         """
         # 1. Load English names
         try:
             locale_en = Locale('en')
             for code, name in locale_en.territories.items():
-                self.country_map[name.lower()] = code
+                self.country_map[name.casefold()] = code
         except Exception as e:
-            logger.error(f"Error loading English locale data: {e}")
+            logger.error("Error loading English locale data: %s", e)
 
         # 2. Load Chinese names
         try:
             locale_zh = Locale('zh')
             for code, name in locale_zh.territories.items():
-                self.country_map[name.lower()] = code
+                self.country_map[name.casefold()] = code
         except Exception as e:
-            logger.error(f"Error loading Chinese locale data: {e}")
+            logger.error("Error loading Chinese locale data: %s", e)
 
         # 3. Add ISO codes themselves (2-letter and 3-letter support if possible, mainly 2 for now)
         # We can iterate through the loaded map values to get valid codes
         valid_codes = set(self.country_map.values())
         for code in valid_codes:
-            self.country_map[code.lower()] = code
+            self.country_map[code.casefold()] = code
 
         # Add 3-letter ISO codes using babel territory aliases
         try:
@@ -51,9 +191,9 @@ class CountryManager:
                 if len(alias) == 3 and alias.isalpha() and isinstance(replacement, list) and len(replacement) == 1:
                     target_code = replacement[0]
                     if target_code in valid_codes:
-                        self.country_map[alias.lower()] = target_code
+                        self.country_map[alias.casefold()] = target_code
         except Exception as e:
-            logger.error(f"Error loading 3-letter codes: {e}")
+            logger.error("Error loading 3-letter codes: %s", e)
 
         # 4. Add Manual Aliases (Colloquialisms)
         # These are commonly used terms that might not appear in official territory lists
@@ -70,45 +210,17 @@ class CountryManager:
         for alias, code in manual_aliases.items():
             self.country_map[alias] = code
         
-        logger.info(f"Loaded {len(self.country_map)} country name mappings.")
+        logger.info("Loaded %s country name mappings.", len(self.country_map))
 
     def _build_faker_map(self):
         """
-        Dynamically builds a map from ISO country codes to Faker locales
-        based on available locales in Faker.
+        Loads the precomputed ISO country code -> Faker locale map.
+        Entries for locales missing from the installed Faker are skipped (callers fall back to en_US).
         """
-        territory_locales = {}
-
-        for loc_str in AVAILABLE_LOCALES:
-            try:
-                l = Locale.parse(loc_str)
-                terr = l.territory
-                if terr:
-                    if terr not in territory_locales:
-                        territory_locales[terr] = []
-                    territory_locales[terr].append(loc_str)
-            except Exception:
-                # Ignore locales that cannot be parsed by Babel
-                continue
-
-        for territory, locales in territory_locales.items():
-            # Strategy: prefer English (en_XX), then fallback to first alphabetically
-            selected = None
-
-            # 1. Try to find a locale starting with 'en_'
-            for loc in locales:
-                if loc.startswith('en_'):
-                    selected = loc
-                    break
-
-            # 2. If not found, just pick the first one after sorting
-            if not selected:
-                locales.sort()
-                selected = locales[0]
-
-            self.iso_to_faker[territory] = selected
-
-        logger.info(f"Built Faker locale map with {len(self.iso_to_faker)} entries.")
+        available = set(AVAILABLE_LOCALES)
+        self.iso_to_faker = {code: loc for code, loc in ISO_TO_FAKER.items() if loc in available}
+
+        logger.info("Built Faker locale map with %s entries.", len(self.iso_to_faker))
 
     def normalize(self, input_str: str) -> str:
         """
@@ -117,9 +229,9 @@ class CountryManager:
         """
         if not input_str:
             return None
-        
-        normalized_input = input_str.strip().lower()
-        return self.country_map.get(normalized_input)
+
+        # Keys are stored casefolded, which also folds Unicode case variants (e.g. ß -> ss)
+        return self.country_map.get(input_str.strip().casefold())
 
     def get_faker_locale(self, iso_code: str) -> str:
         """
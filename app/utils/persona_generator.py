@@ -81,7 +81,7 @@ class PersonaGenerator:
                      return phonenumbers.format_number(example, PhoneNumberFormat.INTERNATIONAL)
 
         except Exception as e:
-            logger.warning(f"Failed to generate phone number using phonenumbers for {country_code}: {e}")
+            logger.warning("Failed to generate phone number using phonenumbers for %s: %s", country_code, e)
 
         # Fallback to Faker
         return fake.phone_number()
@@ -0,0 +1,54 @@
+"""
+Prints the ISO_TO_FAKER table used by app/utils/country_manager.py.
+
+Run this after upgrading Faker or Babel and paste the output over the
+existing ISO_TO_FAKER literal:
+
+    python scripts/generate_faker_map.py
+"""
+from babel import Locale
+from faker.config import AVAILABLE_LOCALES
+
+def build_faker_map():
+    """
+    Maps each ISO country code to a Faker locale, based on the locales available in Faker.
+    """
+    territory_locales = {}
+
+    for loc_str in AVAILABLE_LOCALES:
+        try:
+            l = Locale.parse(loc_str)
+            terr = l.territory
+            if terr:
+                if terr not in territory_locales:
+                    territory_locales[terr] = []
+                territory_locales[terr].append(loc_str)
+        except Exception:
+            # Ignore locales that cannot be parsed by Babel
+            continue
+
+    iso_to_faker = {}
+    for territory, locales in territory_locales.items():
+        # Strategy: prefer English (en_XX), then fallback to first alphabetically
+        selected = None
+
+        # 1. Try to find a locale starting with 'en_'
+        for loc in locales:
+            if loc.startswith('en_'):
+                selected = loc
+                break
+
+        # 2. If not found, just pick the first one after sorting
+        if not selected:
+            locales.sort()
+            selected = locales[0]
+
+        iso_to_faker[territory] = selected
+
+    return iso_to_faker
+
+if __name__ == "__main__":
+    print("ISO_TO_FAKER = {")
+    for territory, locale in sorted(build_faker_map().items()):
+        print(f'    "{territory}": "{locale}",')
+    print("}")
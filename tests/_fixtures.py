@@ -0,0 +1,29 @@
+"""
+Read-only test data and helpers shared across test modules.
+"""
+import orjson
+from types import SimpleNamespace
+
+# (user input, expected ISO code) pairs for CountryManager.normalize
+COUNTRY_NORMALIZE_CASES = (
+    ("美国", "US"),
+    ("United States", "US"),
+    ("USA", "US"),
+    ("America", "US"),
+    ("China", "CN"),
+    ("中国", "CN"),
+    ("CN", "CN"),
+    ("Germany", "DE"),
+    # ("Deutschland", "DE"), # Babel might know this if we load 'de' locale too, but let's check en/zh coverage
+    ("France", "FR"),
+    ("法国", "FR"),
+    ("JAPAN", "JP"),
+    ("日本", "JP"),
+    ("  UNITED KINGDOM ", "GB"),
+    ("UnknownLand", None),
+)
+
+def fake_response(payload, status=200):
+    """Minimal stand-in for an httpx response: cheaper than a MagicMock and strict about attributes."""
+    # default=dict lets orjson encode MappingProxyType payloads
+    return SimpleNamespace(status_code=status, content=orjson.dumps(payload, default=dict), text="")
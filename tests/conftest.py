@@ -0,0 +1,49 @@
+import httpx
+import pytest
+
+@pytest.fixture(autouse=True)
+def _no_network(monkeypatch):
+    """
+    Fails any real outbound HTTP request made through httpx.AsyncClient (what AddressFetcher uses).
+    Tests that need responses patch the fetcher's client, which never reaches this.
+    The sync httpx.Client used by TestClient is left alone.
+    pytest.fail raises a BaseException, so the app's error handling can't swallow it.
+    """
+    async def _blocked(*args, **kwargs):
+        pytest.fail("network access is blocked in tests; patch address_fetcher.client instead")
+    monkeypatch.setattr(httpx.AsyncClient, "send", _blocked)
+
+@pytest.fixture(scope="session", autouse=True)
+def _warm_faker_cache():
+    """
+    Builds the Faker instances used across the suite once per session.
+    CountryManager.get_faker caches them per locale, so later tests reuse them.
+    """
+    from app.utils.persona_generator import persona_generator
+    for country_code in ("US", "ZW", "VA", "AQ"):
+        persona_generator.generate(country_code)
+
+@pytest.fixture
+def reset_address_fetcher():
+    """
+    Clears the state the module-level AddressFetcher keeps between lookups,
+    so cached results and tripped breakers don't leak between tests.
+    """
+    from app.utils.address_fetcher import address_fetcher
+    address_fetcher._cache.clear()
+    address_fetcher._inflight.clear()
+    address_fetcher._endpoint_failures.clear()
+    address_fetcher._endpoint_failed_at.clear()
+    address_fetcher._breaker.reset()
+    address_fetcher._redis_breaker.reset()
+    return address_fetcher
+
+@pytest.fixture(scope="session")
+def client():
+    """
+    One TestClient for the whole session; entering it runs the app lifespan once.
+    """
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as c:
+        yield c
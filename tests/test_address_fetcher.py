@@ -1,25 +1,105 @@
+import asyncio
+import pytest
+from unittest.mock import patch, AsyncMock
 from app.utils.address_fetcher import address_fetcher
+from _fixtures import fake_response
 
-def test_fetcher():
-    # Test 1: Generic US Search
-    print("Test 1: Generic US Search")
-    addr = address_fetcher.fetch_real_address("US")
-    print(f"Result: {addr}\n")
-
-    # Test 2: Specific City (New York)
-    print("Test 2: Specific City (New York, US)")
-    addr = address_fetcher.fetch_real_address("US", city="New York")
-    print(f"Result: {addr}\n")
-
-    # Test 3: Conflict / Anti-Stupid (Beijing, US) -> Should fallback to random US city
-    print("Test 3: Conflict (Beijing, US)")
-    addr = address_fetcher.fetch_real_address("US", city="Beijing")
-    print(f"Result: {addr}\n")
-
-    # Test 4: China Search
-    print("Test 4: China Search")
-    addr = address_fetcher.fetch_real_address("CN")
-    print(f"Result: {addr}\n")
-
-if __name__ == "__main__":
-    test_fetcher()
+_FAKE_OSM = {
+    "US": [{
+        "display_name": "Hotel Empire, 44, West 63rd Street, Manhattan, New York, 10023, United States",
+        "address": {
+            "house_number": "44",
+            "road": "West 63rd Street",
+            "city": "New York",
+            "state": "New York",
+            "postcode": "10023",
+            "country": "United States",
+            "country_code": "us"
+        }
+    }],
+    "CN": [{
+        "display_name": "王府井大街, 东城区, 北京市, 100006, 中国",
+        "address": {
+            "road": "王府井大街",
+            "city": "北京市",
+            "postcode": "100006",
+            "country": "中国",
+            "country_code": "cn"
+        }
+    }],
+}
+
+@pytest.fixture(scope="module")
+def fake_osm():
+    return _FAKE_OSM
+
+@pytest.fixture
+def mock_client(reset_address_fetcher):
+    """Replaces the Nominatim HTTP client and skips the rate-limit sleep."""
+    with patch.object(address_fetcher, "client", new_callable=AsyncMock) as client, \
+            patch.object(address_fetcher, "_wait_for_rate_limit", new_callable=AsyncMock):
+        yield client
+
+def test_generic_us(mock_client, fake_osm):
+    mock_client.get.return_value = fake_response(fake_osm["US"])
+
+    result = asyncio.run(address_fetcher.fetch_real_address("US"))
+
+    assert result["country"] == "United States"
+    # No user input: goes straight to the random-city search
+    assert "city" in mock_client.get.call_args.kwargs["params"]
+
+def test_specific_city(mock_client, fake_osm):
+    mock_client.get.return_value = fake_response(fake_osm["US"])
+
+    result = asyncio.run(address_fetcher.fetch_real_address("US", city="New York"))
+
+    assert result["city"] == "New York"
+    assert result["address"] == "44 West 63rd Street"
+    assert mock_client.get.call_args.kwargs["params"]["city"] == "New York"
+
+def test_conflict_fallback(mock_client, fake_osm):
+    # Beijing isn't in the US: Level 1 finds nothing, Level 2 falls back to a real US city
+    mock_client.get.side_effect = [fake_response([])] + [fake_response(fake_osm["US"])] * 10
+
+    result = asyncio.run(address_fetcher.fetch_real_address("US", city="Beijing"))
+
+    assert result["country"] == "United States"
+    first_params = mock_client.get.call_args_list[0].kwargs["params"]
+    assert first_params["city"] == "Beijing"
+
+def test_china(mock_client, fake_osm):
+    mock_client.get.return_value = fake_response(fake_osm["CN"])
+
+    result = asyncio.run(address_fetcher.fetch_real_address("CN"))
+
+    assert result["country"] == "中国"
+    assert result["zipcode"] == "100006"
+    assert mock_client.get.call_args.kwargs["params"]["countrycodes"] == "CN"
+
+def test_lazy_client_is_rebuilt_per_event_loop():
+    """A client opened under one asyncio.run() isn't reused by the next, whose loop it doesn't belong to."""
+    async def open_client():
+        await address_fetcher._ensure_clients()
+        return address_fetcher.client
+
+    with patch.object(address_fetcher, "client", None), \
+            patch.object(address_fetcher, "redis", None), \
+            patch.object(address_fetcher, "_opened_clients", {}), \
+            patch.object(address_fetcher, "_client_loop", None):
+        first = asyncio.run(open_client())
+        second = asyncio.run(open_client())
+        asyncio.run(address_fetcher.shutdown())
+
+    assert first is not second
+
+def test_unpatched_lookup_is_blocked(reset_address_fetcher):
+    """A lookup that would reach Nominatim fails the test instead of quietly returning None."""
+    with patch.object(address_fetcher, "client", None), \
+            patch.object(address_fetcher, "redis", None), \
+            patch.object(address_fetcher, "_opened_clients", {}), \
+            patch.object(address_fetcher, "_client_loop", None), \
+            patch.object(address_fetcher, "_wait_for_rate_limit", new_callable=AsyncMock):
+        with pytest.raises(pytest.fail.Exception, match="network access is blocked"):
+            asyncio.run(address_fetcher.fetch_real_address("US", city="Boston"))
+        asyncio.run(address_fetcher.shutdown())
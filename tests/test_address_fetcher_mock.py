@@ -1,99 +1,257 @@
+import asyncio
+import httpx
+import orjson
+import pytest
 import unittest
-from unittest.mock import patch, MagicMock
-from app.utils.address_fetcher import address_fetcher
+from types import MappingProxyType
+from unittest.mock import patch, AsyncMock
+from app.utils.address_fetcher import address_fetcher, ENDPOINT_COOLDOWN_SECONDS
+from _fixtures import fake_response
 
-class TestAddressFetcher(unittest.TestCase):
+# Read-only OSM payloads shared by the tests (real sample shapes from Nominatim)
+_NY_OSM = MappingProxyType({
+    "place_id": 12345,
+    "display_name": "Hotel Empire, 44, West 63rd Street, Lincoln Square, Manhattan, New York County, New York, 10023, United States",
+    "address": MappingProxyType({
+        "hotel": "Hotel Empire",
+        "house_number": "44",
+        "road": "West 63rd Street",
+        "suburb": "Lincoln Square",
+        "borough": "Manhattan",
+        "county": "New York County",
+        "city": "New York",
+        "state": "New York",
+        "postcode": "10023",
+        "country": "United States",
+        "country_code": "us"
+    })
+})
+_CHICAGO_OSM = MappingProxyType({
+    "address": MappingProxyType({
+        "road": "Random St",
+        "city": "Chicago",
+        "country": "United States",
+        "postcode": "60601"
+    }),
+    "display_name": "Random St, Chicago, US"
+})
+_BEVERLY_HILLS_OSM = MappingProxyType({
+    "address": MappingProxyType({
+        "road": "Beverly Dr",
+        "city": "Beverly Hills",
+        "postcode": "90210",
+        "country": "United States"
+    }),
+    "display_name": "Beverly Dr, Beverly Hills, US"
+})
 
-    @patch('app.utils.address_fetcher.requests.get')
-    def test_fetch_real_address_success(self, mock_get):
-        # Mock Response Data (Real sample from OSM)
-        mock_response = {
-            "place_id": 12345,
-            "display_name": "Hotel Empire, 44, West 63rd Street, Lincoln Square, Manhattan, New York County, New York, 10023, United States",
-            "address": {
-                "hotel": "Hotel Empire",
-                "house_number": "44",
-                "road": "West 63rd Street",
-                "suburb": "Lincoln Square",
-                "borough": "Manhattan",
-                "county": "New York County",
-                "city": "New York",
-                "state": "New York",
-                "postcode": "10023",
-                "country": "United States",
-                "country_code": "us"
-            }
-        }
-        
-        mock_resp_obj = MagicMock()
-        mock_resp_obj.status_code = 200
-        mock_resp_obj.json.return_value = [mock_response] 
-        mock_get.return_value = mock_resp_obj
+# The fetcher is a module-level singleton; reset_address_fetcher keeps cached results from leaking between tests
+@pytest.mark.usefixtures("reset_address_fetcher")
+class TestAddressFetcher(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        # Skip the 1.1s Nominatim spacing; mocked responses don't need it
+        wait_patcher = patch.object(address_fetcher, '_wait_for_rate_limit', new_callable=AsyncMock)
+        wait_patcher.start()
+        self.addCleanup(wait_patcher.stop)
+
+    @patch.object(address_fetcher, 'client', new_callable=AsyncMock)
+    async def test_fetch_real_address_success(self, mock_client):
+        mock_client.get.return_value = fake_response([_NY_OSM])
 
-        result = address_fetcher.fetch_real_address("US", city="New York")
+        result = await address_fetcher.fetch_real_address("US", city="New York")
 
         self.assertIsNotNone(result)
         self.assertEqual(result['city'], "New York")
         self.assertEqual(result['zipcode'], "10023")
         self.assertEqual(result['country'], "United States")
         self.assertIn("West 63rd Street", result['address'])
-        print("\n✅ Test Success: Parsed Mock OSM Response correctly.")
 
-    @patch('app.utils.address_fetcher.requests.get')
-    def test_fallback_logic(self, mock_get):
+    @patch.object(address_fetcher, 'client', new_callable=AsyncMock)
+    async def test_fallback_logic(self, mock_client):
         # Scenario: Level 1 fails (empty list), Level 2 succeeds
-        empty_resp = MagicMock()
-        empty_resp.status_code = 200
-        empty_resp.json.return_value = []
+        empty_resp = fake_response([])
+        valid_resp = fake_response([_CHICAGO_OSM])
 
-        valid_resp_data = {
-            "address": {
-                "road": "Random St",
-                "city": "Chicago",
-                "country": "United States",
-                "postcode": "60601"
-            },
-            "display_name": "Random St, Chicago, US"
-        }
-        valid_resp = MagicMock()
-        valid_resp.status_code = 200
-        valid_resp.json.return_value = [valid_resp_data]
+        mock_client.get.side_effect = [empty_resp, valid_resp, valid_resp, valid_resp] 
 
-        mock_get.side_effect = [empty_resp, valid_resp, valid_resp, valid_resp] 
-
-        result = address_fetcher.fetch_real_address("US", city="NonExistentCity")
+        result = await address_fetcher.fetch_real_address("US", city="NonExistentCity")
         
         self.assertIsNotNone(result)
         self.assertEqual(result['city'], "Chicago")
-        print("✅ Test Success: Fallback logic worked.")
 
-    @patch('app.utils.address_fetcher.requests.get')
-    def test_zipcode_search(self, mock_get):
+    @patch.object(address_fetcher, 'client', new_callable=AsyncMock)
+    async def test_zipcode_search(self, mock_client):
         # Scenario: Search with Zipcode
-        mock_response = {
-            "address": {
-                "road": "Beverly Dr",
-                "city": "Beverly Hills",
-                "postcode": "90210",
-                "country": "United States"
-            },
-            "display_name": "Beverly Dr, Beverly Hills, US"
-        }
-        mock_resp_obj = MagicMock()
-        mock_resp_obj.status_code = 200
-        mock_resp_obj.json.return_value = [mock_response]
-        mock_get.return_value = mock_resp_obj
+        mock_client.get.return_value = fake_response([_BEVERLY_HILLS_OSM])
 
-        result = address_fetcher.fetch_real_address("US", zipcode="90210")
+        result = await address_fetcher.fetch_real_address("US", zipcode="90210")
 
         self.assertIsNotNone(result)
         self.assertEqual(result['zipcode'], "90210")
         
         # Verify that zipcode was actually in the query params of the call
-        args, kwargs = mock_get.call_args
+        args, kwargs = mock_client.get.call_args
         params = kwargs['params']
-        self.assertIn("90210", params['q'])
-        print("✅ Test Success: Zipcode included in search query.")
+        self.assertEqual(params['postalcode'], "90210")
+        self.assertNotIn('q', params)
+        self.assertNotIn('city', params)
+
+        # Repeat zip lookups with the same amenity keyword are cache hits
+        amenity = params['amenity']
+        with patch('app.utils.address_fetcher.SEARCH_KEYWORDS', (amenity,)):
+            await address_fetcher.fetch_real_address("US", zipcode="90210")
+        self.assertEqual(mock_client.get.call_count, 1)
+
+    @patch.object(address_fetcher, 'client', new_callable=AsyncMock)
+    async def test_new_keyword_fetches_other_pois(self, mock_client):
+        # Scenario: A cached query drawn with another amenity keyword gets its own lookup,
+        # so repeated queries keep returning varied POI types
+        mock_client.get.return_value = fake_response([_BEVERLY_HILLS_OSM])
+
+        for amenity in ("cafe", "school", "cafe"):
+            with patch('app.utils.address_fetcher.SEARCH_KEYWORDS', (amenity,)):
+                await address_fetcher.fetch_real_address("US", zipcode="90210")
+
+        amenities = [call.kwargs['params']['amenity'] for call in mock_client.get.call_args_list]
+        self.assertEqual(amenities, ["cafe", "school"])
+
+    @patch('app.utils.address_fetcher.SEARCH_KEYWORDS', ("museum",))
+    @patch.object(address_fetcher, 'client', new_callable=AsyncMock)
+    async def test_repeated_query_uses_cache(self, mock_client):
+        # Scenario: Same city requested twice, only the first should hit Nominatim
+        mock_response = {
+            "address": {
+                "road": "Baker Street",
+                "city": "London",
+                "postcode": "NW1 6XE",
+                "country": "United Kingdom"
+            },
+            "display_name": "Baker Street, London, UK"
+        }
+        mock_client.get.return_value = fake_response([mock_response])
+
+        first = await address_fetcher.fetch_real_address("GB", city="London")
+        second = await address_fetcher.fetch_real_address("GB", city=" london ")
+
+        self.assertEqual(first, second)
+        self.assertEqual(mock_client.get.call_count, 1)
+
+    @patch.object(address_fetcher, 'client', new_callable=AsyncMock)
+    async def test_circuit_breaker_fails_fast(self, mock_client):
+        # Scenario: Nominatim keeps returning 503, the breaker should stop further calls
+        mock_client.get.return_value = fake_response([], status=503)
+
+        result = await address_fetcher.fetch_real_address("US", city="New York")
+
+        self.assertIsNone(result)
+        self.assertEqual(mock_client.get.call_count, address_fetcher._breaker.fail_max)
+        self.assertTrue(address_fetcher._breaker.is_open)
+
+    @patch.object(address_fetcher, 'endpoints', ["https://primary.example/search", "https://mirror.example/search"])
+    @patch.object(address_fetcher, 'client', new_callable=AsyncMock)
+    async def test_endpoint_failover(self, mock_client):
+        # Scenario: Primary endpoint is rate limited, the mirror answers
+        throttled_resp = fake_response([], status=429)
+        valid_resp = fake_response([{
+            "address": {"road": "Rue de Rivoli", "city": "Paris", "postcode": "75001", "country": "France"},
+            "display_name": "Rue de Rivoli, Paris, France"
+        }])
+        mock_client.get.side_effect = [throttled_resp, valid_resp]
+
+        result = await address_fetcher.fetch_real_address("FR", city="Paris")
+
+        self.assertEqual(result['city'], "Paris")
+        called_urls = [call.args[0] for call in mock_client.get.call_args_list]
+        self.assertEqual(called_urls, ["https://primary.example/search", "https://mirror.example/search"])
+        # The throttled primary is now tried after the healthy mirror
+        self.assertEqual(address_fetcher._ordered_endpoints()[0], "https://mirror.example/search")
+        self.assertFalse(address_fetcher._breaker.is_open)
+
+        # Once the cooldown has passed, the primary gets its configured place back
+        address_fetcher._endpoint_failed_at["https://primary.example/search"] -= ENDPOINT_COOLDOWN_SECONDS
+        self.assertEqual(address_fetcher._ordered_endpoints()[0], "https://primary.example/search")
+
+    @patch.object(address_fetcher, 'client', new_callable=AsyncMock)
+    async def test_non_transport_http_error_is_contained(self, mock_client):
+        # Scenario: The client raises an httpx error that isn't a TransportError
+        mock_client.get.side_effect = httpx.DecodingError("bad gzip")
+
+        result = await address_fetcher.fetch_real_address("US", city="Boston")
+
+        self.assertIsNone(result)
+        self.assertGreater(address_fetcher._endpoint_failures[address_fetcher.endpoints[0]], 0)
+
+    @patch('app.utils.address_fetcher.SEARCH_KEYWORDS', ("library",))
+    @patch.object(address_fetcher, 'client', new_callable=AsyncMock)
+    async def test_concurrent_identical_queries_are_coalesced(self, mock_client):
+        # Scenario: Two clients ask for the same city (and draw the same keyword) before anything is cached
+        mock_resp_obj = fake_response([{
+            "address": {"road": "Unter den Linden", "city": "Berlin", "postcode": "10117", "country": "Deutschland"},
+            "display_name": "Unter den Linden, Berlin, Deutschland"
+        }])
+
+        async def slow_get(*args, **kwargs):
+            # Yield to the event loop so the second request starts while the first is in flight
+            await asyncio.sleep(0.01)
+            return mock_resp_obj
+        mock_client.get.side_effect = slow_get
+
+        first, second = await asyncio.gather(
+            address_fetcher.fetch_real_address("DE", city="Berlin"),
+            address_fetcher.fetch_real_address("DE", city="Berlin"),
+        )
+
+        self.assertEqual(first['city'], "Berlin")
+        self.assertEqual(second['city'], "Berlin")
+        self.assertEqual(mock_client.get.call_count, 1)
+        self.assertEqual(address_fetcher._inflight, {})
+
+    def test_pick_result_prefers_postcode(self):
+        results = [
+            {"address": {"road": "No Zip Rd", "city": "Springfield"}},
+            {"address": {"road": "First Zip St", "city": "Springfield", "postcode": "11111"}},
+            {"address": {"road": "Also No Zip Ln", "city": "Springfield"}},
+            {"address": {"road": "Second Zip Ave", "city": "Springfield", "postcode": "22222"}},
+        ]
+        picked = {address_fetcher._pick_result(results)['zipcode'] for _ in range(50)}
+        self.assertEqual(picked, {"11111", "22222"})
+
+        no_zip = [results[0], results[2]]
+        self.assertEqual(address_fetcher._pick_result(no_zip, zipcode="99999")['zipcode'], "99999")
+
+    @patch.object(address_fetcher, 'redis', new_callable=AsyncMock)
+    @patch.object(address_fetcher, 'client', new_callable=AsyncMock)
+    async def test_redis_cache_hit_skips_http(self, mock_client, mock_redis):
+        # Scenario: Another worker already cached this query in Redis
+        mock_redis.get.return_value = orjson.dumps([{
+            "address": {"road": "Nanjing Road", "city": "Shanghai", "postcode": "200001", "country": "中国"},
+            "display_name": "Nanjing Road, Shanghai, China"
+        }])
+
+        result = await address_fetcher.fetch_real_address("CN", city="Shanghai")
+
+        self.assertEqual(result['city'], "Shanghai")
+        mock_client.get.assert_not_called()
+        # Redis hits also populate the in-process cache
+        self.assertEqual(len(address_fetcher._cache), 1)
+
+    @patch.object(address_fetcher, 'redis', new_callable=AsyncMock)
+    @patch.object(address_fetcher, 'client', new_callable=AsyncMock)
+    async def test_redis_cache_miss_stores_results(self, mock_client, mock_redis):
+        mock_redis.get.return_value = None
+        mock_resp_obj = fake_response([{
+            "address": {"road": "Dotonbori", "city": "Osaka", "postcode": "542-0071", "country": "日本"},
+            "display_name": "Dotonbori, Osaka, Japan"
+        }])
+        mock_client.get.return_value = mock_resp_obj
+
+        result = await address_fetcher.fetch_real_address("JP", city="Osaka")
+
+        self.assertEqual(result['city'], "Osaka")
+        args, kwargs = mock_redis.set.call_args
+        self.assertEqual(orjson.loads(args[1])[0]['address']['city'], "Osaka")
+        self.assertEqual(kwargs['ex'], 86400)
 
 if __name__ == '__main__':
     unittest.main()
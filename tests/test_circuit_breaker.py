@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import patch
+from app.utils.circuit_breaker import CircuitBreaker
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker("test", fail_max=3, reset_timeout=60)
+        for _ in range(2):
+            breaker.record_failure()
+        self.assertTrue(breaker.allow_request())
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+
+    def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker("test", fail_max=2, reset_timeout=60)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    @patch("app.utils.circuit_breaker.time.monotonic")
+    def test_half_open_after_reset_timeout(self, mock_monotonic):
+        breaker = CircuitBreaker("test", fail_max=1, reset_timeout=60)
+        mock_monotonic.return_value = 100.0
+        breaker.record_failure()
+        self.assertFalse(breaker.allow_request())
+
+        # Cool-down elapsed: one trial call is allowed through
+        mock_monotonic.return_value = 161.0
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow_request())
+        # ...and everyone else keeps failing fast until its outcome is recorded
+        self.assertFalse(breaker.allow_request())
+
+        # A failed trial re-opens the circuit immediately
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        mock_monotonic.return_value = 222.0
+        self.assertTrue(breaker.allow_request())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow_request())
+
+    @patch("app.utils.circuit_breaker.time.monotonic")
+    def test_unrecorded_trial_expires(self, mock_monotonic):
+        breaker = CircuitBreaker("test", fail_max=1, reset_timeout=60)
+        mock_monotonic.return_value = 100.0
+        breaker.record_failure()
+
+        mock_monotonic.return_value = 161.0
+        self.assertTrue(breaker.allow_request())
+        # The trial never reported back (e.g. it was cancelled): a new one is allowed after the timeout
+        mock_monotonic.return_value = 222.0
+        self.assertTrue(breaker.allow_request())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,59 +1,79 @@
-import unittest
-from app.utils.country_manager import country_manager
-
-class TestCountryManager(unittest.TestCase):
-    def test_normalization(self):
-        test_cases = [
-            ("美国", "US"),
-            ("United States", "US"),
-            ("USA", "US"),
-            ("America", "US"),
-            ("China", "CN"),
-            ("中国", "CN"),
-            ("CN", "CN"),
-            ("Germany", "DE"),
-            # ("Deutschland", "DE"), # Babel might know this if we load 'de' locale too, but let's check en/zh coverage
-            ("France", "FR"),
-            ("法国", "FR"),
-            ("JAPAN", "JP"),
-            ("日本", "JP"),
-            ("UnknownLand", None),
-        ]
-
-        print("Running Country Normalization Tests...")
-        for input_str, expected in test_cases:
-            result = country_manager.normalize(input_str)
-            self.assertEqual(result, expected, f"Input: '{input_str}' -> Expected: {expected}, Got: {result}")
-
-    def test_get_faker_locale(self):
-        """Test that get_faker_locale returns appropriate locales."""
-        # Test basic mappings that should always exist if Faker is installed
-        self.assertEqual(country_manager.get_faker_locale("US"), "en_US")
-        self.assertEqual(country_manager.get_faker_locale("CN"), "zh_CN")
-        self.assertEqual(country_manager.get_faker_locale("JP"), "ja_JP")
-
-        # Test dynamically added mappings
-        # Switzerland should have a mapping (likely de_CH)
-        ch_locale = country_manager.get_faker_locale("CH")
-        self.assertTrue(ch_locale.endswith("CH"), f"Expected *CH, got {ch_locale}")
-
-        # Test priority (English preference)
-        # Canada has en_CA and fr_CA. We prefer en_CA.
-        self.assertEqual(country_manager.get_faker_locale("CA"), "en_CA")
-
-        # India has multiple languages. We prefer en_IN.
-        self.assertEqual(country_manager.get_faker_locale("IN"), "en_IN")
-
-        # Test fallback for known country but no specific locale (depends on installed Faker)
-        # If HK is not supported by Faker, it should fallback to en_US
-        # If it IS supported, it should be something ending in HK.
-        # Given current faker version (38.2.0), HK is not supported.
-        hk_locale = country_manager.get_faker_locale("HK")
-        self.assertEqual(hk_locale, "en_US")
-
-        # Test unknown country
-        self.assertEqual(country_manager.get_faker_locale("ZZ"), "en_US")
-        self.assertEqual(country_manager.get_faker_locale(None), "en_US")
-
-if __name__ == "__main__":
-    unittest.main()
+import json
+import pytest
+from unittest.mock import patch
+from app.utils.country_manager import CountryManager, country_manager
+from _fixtures import COUNTRY_NORMALIZE_CASES
+
+@pytest.mark.parametrize("inp,expected", COUNTRY_NORMALIZE_CASES)
+def test_normalize(inp, expected):
+    assert country_manager.normalize(inp) == expected
+
+def test_get_faker_locale():
+    """Test that get_faker_locale returns appropriate locales."""
+    # Test basic mappings that should always exist if Faker is installed
+    assert country_manager.get_faker_locale("US") == "en_US"
+    assert country_manager.get_faker_locale("CN") == "zh_CN"
+    assert country_manager.get_faker_locale("JP") == "ja_JP"
+
+    # Test dynamically added mappings
+    # Switzerland should have a mapping (likely de_CH)
+    ch_locale = country_manager.get_faker_locale("CH")
+    assert ch_locale.endswith("CH"), f"Expected *CH, got {ch_locale}"
+
+    # Test priority (English preference)
+    # Canada has en_CA and fr_CA. We prefer en_CA.
+    assert country_manager.get_faker_locale("CA") == "en_CA"
+
+    # India has multiple languages. We prefer en_IN.
+    assert country_manager.get_faker_locale("IN") == "en_IN"
+
+    # Test fallback for known country but no specific locale (depends on installed Faker)
+    # If HK is not supported by Faker, it should fallback to en_US
+    # If it IS supported, it should be something ending in HK.
+    # Given current faker version (38.2.0), HK is not supported.
+    assert country_manager.get_faker_locale("HK") == "en_US"
+
+    # Test unknown country
+    assert country_manager.get_faker_locale("ZZ") == "en_US"
+    assert country_manager.get_faker_locale(None) == "en_US"
+
+def test_get_faker_is_cached():
+    """Faker instances are built once per locale and reused."""
+    assert country_manager.get_faker("US") is country_manager.get_faker("US")
+    # Countries without their own locale share the en_US instance
+    assert country_manager.get_faker("ZZ") is country_manager.get_faker("US")
+
+def test_maps_are_cached_on_disk(tmp_path):
+    """A second manager loads the maps from disk instead of rebuilding them."""
+    cache_path = tmp_path / "country_maps.json"
+    with patch("app.utils.country_manager._cache_file_path", return_value=str(cache_path)):
+        built = CountryManager()
+        assert cache_path.exists()
+
+        with patch.object(CountryManager, "load_country_data") as mock_load:
+            cached = CountryManager()
+        mock_load.assert_not_called()
+
+    assert cached.country_map == built.country_map
+    assert cached.iso_to_faker == built.iso_to_faker
+    assert cached.normalize("美国") == "US"
+
+@pytest.mark.parametrize("contents", ["null", "[]", "{not json", '{"fingerprint": null}'])
+def test_corrupt_cache_file_is_rebuilt(tmp_path, contents):
+    """A cache file of the wrong shape is ignored and the maps are rebuilt from Babel."""
+    cache_path = tmp_path / "country_maps.json"
+    cache_path.write_text(contents, encoding="utf-8")
+    with patch("app.utils.country_manager._cache_file_path", return_value=str(cache_path)):
+        manager = CountryManager()
+    assert manager.normalize("美国") == "US"
+
+def test_cache_file_with_wrong_map_type_is_rebuilt(tmp_path):
+    cache_path = tmp_path / "country_maps.json"
+    with patch("app.utils.country_manager._cache_file_path", return_value=str(cache_path)):
+        CountryManager()
+        data = json.loads(cache_path.read_text(encoding="utf-8"))
+        data["country_map"] = []
+        cache_path.write_text(json.dumps(data), encoding="utf-8")
+
+        manager = CountryManager()
+    assert manager.normalize("USA") == "US"
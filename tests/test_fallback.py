@@ -1,26 +1,22 @@
 
 import pytest
-from unittest.mock import patch
-from fastapi.testclient import TestClient
-from app.main import app
-
-client = TestClient(app)
+from unittest.mock import patch, AsyncMock
 
 @patch("app.main.address_fetcher")
-def test_generate_address_unknown_country_fallback(mock_address_fetcher):
+def test_generate_address_unknown_country_fallback(mock_address_fetcher, client):
     """
     Test that when an unknown country is provided, the API defaults to US
     instead of raising a 400 error.
     """
     # Setup mock return value for success case
-    mock_address_fetcher.fetch_real_address.return_value = {
+    mock_address_fetcher.fetch_real_address = AsyncMock(return_value={
         "address": "123 Test St",
         "city": "Test City",
         "state": "TS",
         "zipcode": "12345",
         "country": "United States",
         "full_address": "123 Test St, Test City, TS, United States"
-    }
+    })
 
     response = client.get("/api/generate?country=UnknownLand")
 
@@ -35,18 +31,18 @@ def test_generate_address_unknown_country_fallback(mock_address_fetcher):
     assert data["country"] == "United States"
 
 @patch("app.main.address_fetcher")
-def test_generate_address_known_country(mock_address_fetcher):
+def test_generate_address_known_country(mock_address_fetcher, client):
     """
     Test that when a known country is provided, the API uses it.
     """
-    mock_address_fetcher.fetch_real_address.return_value = {
+    mock_address_fetcher.fetch_real_address = AsyncMock(return_value={
         "address": "10 Downing St",
         "city": "London",
         "state": "London",
         "zipcode": "SW1A 2AA",
         "country": "United Kingdom",
         "full_address": "10 Downing St, London, United Kingdom"
-    }
+    })
 
     response = client.get("/api/generate?country=UK")
 